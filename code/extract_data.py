@@ -24,9 +24,53 @@ import argparse
 import logging
 import tarfile
 
-from os import makedirs
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import makedirs, replace, scandir
 from pathlib import Path
-from shutil import copy, move, rmtree
+from shutil import copy, rmtree
+
+
+def extract_order_and_mapping_files(tarpath, output_dir):
+    """
+    Extract the order file and the ID mapping file
+    from the given tarball into the given output
+    directory, under `data/<prefix>/proceedings`.
+
+    Parameters
+    ----------
+    tarpath : pathlib.Path
+        Path to a `<prefix>_data.tgz` tarball.
+    output_dir : pathlib.Path
+        The directory under which the files are extracted.
+
+    Raises
+    ------
+    KeyError
+        If either of the files is not in the tarball.
+    """
+    prefix = tarpath.name.split('_')[0]
+    logging.info(' {}'.format(prefix))
+    subpath = 'data/{}/proceedings'.format(prefix)
+    wanted_names = {'{}/order'.format(subpath),
+                    '{}/id_map.txt'.format(subpath)}
+
+    # read the tarball as a stream in a single pass and
+    # only extract the two files that we want, stopping
+    # as soon as we have found both of them
+    with tarfile.open(tarpath, 'r|gz') as datafh:
+        for member in datafh:
+            if member.name in wanted_names:
+                datafh.extract(member, path=output_dir)
+                wanted_names.remove(member.name)
+                if not wanted_names:
+                    break
+
+    # make sure that we did find both of the files
+    # since the rest of the script relies on them
+    if wanted_names:
+        raise KeyError("{}: filename(s) {} not found".format(tarpath,
+                                                              ', '.join(sorted(wanted_names))))
 
 
 def main():
@@ -59,32 +103,44 @@ def main():
     for dir_name in [args.output_dir, xml_dir, order_dir, mapping_dir]:
         makedirs(dir_name, exist_ok=True)
 
-    # now copy them over from the input to to the output directory
-    logging.info('Copying XML files ...')
-    for filename in ['N19.xml', 'W19.xml', 'S19.xml']:
-        filepath = args.input_dir / filename
-        copy(filepath, xml_dir)
-
-    # next extract the order files from each of the tarballs under `data`
-    logging.info('Extracting order and mapping files ...')
-    num_tarballs = 0
-    for tarpath in args.input_dir.glob('*_data.tgz'):
-        num_tarballs += 1
-        prefix = tarpath.name.split('_')[0]
-        logging.info(' {}'.format(prefix))
-        subpath = 'data/{}/proceedings'.format(prefix)
-        with tarfile.open(tarpath, 'r:gz') as datafh:
-            datafh.extractall(path=args.output_dir,
-                              members=[datafh.getmember('{}/order'.format(subpath)),
-                                       datafh.getmember('{}/id_map.txt'.format(subpath))])
-
-    # move the extracted files into the right sub-directories
+    # the XML files and the tarballs are independent of each other
+    # and most of the time is spent reading, decompressing, and
+    # writing files so we process them in parallel using threads
+    with ThreadPoolExecutor(max_workers=8) as executor:
+
+        # now copy them over from the input to to the output directory
+        logging.info('Copying XML files ...')
+        xml_paths = [args.input_dir / filename for filename in ['N19.xml', 'W19.xml', 'S19.xml']]
+        copy_results = executor.map(partial(copy, dst=xml_dir), xml_paths)
+
+        # next extract the order files from each of the tarballs under `data`;
+        # we create the `data` directory ourselves first so that the
+        # threads do not race each other trying to create it
+        logging.info('Extracting order and mapping files ...')
+        makedirs(args.output_dir / 'data', exist_ok=True)
+        tarpaths = list(args.input_dir.glob('*_data.tgz'))
+        num_tarballs = len(tarpaths)
+        extract_results = executor.map(partial(extract_order_and_mapping_files,
+                                               output_dir=args.output_dir),
+                                       tarpaths)
+
+        # now that both the copies and the extractions have been
+        # submitted, wait for all of them to finish; this also
+        # re-raises any exception raised in any of the threads
+        list(copy_results)
+        list(extract_results)
+
+    # move the extracted files into the right sub-directories;
+    # everything is under the output directory and, therefore,
+    # on the same file system so a simple rename is enough
     logging.info('Re-organizing files ...')
-    for session_dir in (args.output_dir / 'data').iterdir():
-        move(session_dir / 'proceedings' / 'order',
-             order_dir / '{}_order'.format(session_dir.name))
-        move(session_dir / 'proceedings' / 'id_map.txt',
-             mapping_dir / '{}_id_map.txt'.format(session_dir.name))
+    with scandir(args.output_dir / 'data') as session_dirs:
+        for session_dir in session_dirs:
+            proceedings_dir = Path(session_dir.path) / 'proceedings'
+            replace(proceedings_dir / 'order',
+                    order_dir / '{}_order'.format(session_dir.name))
+            replace(proceedings_dir / 'id_map.txt',
+                    mapping_dir / '{}_id_map.txt'.format(session_dir.name))
 
     # make sure we have the expected number of files
     assert len(list(xml_dir.glob('*.xml'))) == 3
@@ -12,15 +12,24 @@ Date: May, 2019
 """
 
 import csv
+import hashlib
 import html
+import os
+import pickle
 import re
+import sys
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from tempfile import NamedTemporaryFile
+from xml.etree.ElementTree import XMLPullParser
 
-from bs4 import BeautifulSoup
-
-# define a named tuple that will contain the metadata for each item
+# define a named tuple that will contain the metadata for each item;
+# named tuples have no per-instance `__dict__` and their fields are
+# plain tuple slots so they are already as compact as a slotted class
+# while still being usable as regular tuples by the website/app code
 MetadataTuple = namedtuple('MetadataTuple',
                            ['title',
                             'authors',
@@ -28,6 +37,66 @@ MetadataTuple = namedtuple('MetadataTuple',
                             'pdf_url',
                             'video_url'])
 
+# the version of the pickled `ScheduleMetadata` instances
+# saved by `fromfiles_cached()`; this must be incremented
+# whenever the parsing code changes so that older cached
+# instances are no longer used
+_CACHE_FORMAT_VERSION = 1
+
+# the size of the read buffer used when opening the
+# larger input files so that we read them in big chunks
+_READ_BUFFER_SIZE = 1 << 20
+
+# the control characters that are not allowed in XML;
+# these are all single bytes in UTF-8 so they can be
+# removed from the raw bytes before they are parsed
+_INVALID_XML_BYTES = bytes(byte for byte in range(32) if byte not in b'\t\n\r')
+
+# anthology IDs start with one of these prefixes
+# whereas order file IDs always start with a number
+_ANTHOLOGY_ID_PREFIXES = ('N', 'W', 'S')
+
+# define a regular expression that splits a string like
+# "A, B and C" into the individual author names
+_AUTHOR_SEPARATOR_REGEXP = re.compile(r',|\band ')
+
+
+def _element_text(element):
+    """
+    Return all of the text contained in the given XML
+    element, including the text of any nested elements
+    such as `<fixed-case>`.
+    """
+    return ''.join(element.itertext())
+
+
+def _iter_xml_elements(xmlfh, tag):
+    """
+    Incrementally parse the XML read from the given binary
+    file handle and yield each element with the given tag
+    as soon as it has been completely read in. The anthology
+    files sometimes contain control characters that are not
+    allowed in XML so these are removed before parsing.
+    """
+    parser = XMLPullParser(events=('end',))
+    for chunk in iter(partial(xmlfh.read, _READ_BUFFER_SIZE), b''):
+        parser.feed(chunk.translate(None, _INVALID_XML_BYTES))
+        for _, element in parser.read_events():
+            if element.tag == tag:
+                yield element
+    parser.close()
+
+
+def _file_signature(filepath):
+    """
+    Return a tuple containing the absolute path, the
+    modification time, and the size of the given file
+    which can be used to detect whether it has changed.
+    """
+    filepath = Path(filepath).resolve()
+    stat = filepath.stat()
+    return (str(filepath), stat.st_mtime_ns, stat.st_size)
+
 
 class ScheduleMetadata(object):
     """
@@ -37,20 +106,34 @@ class ScheduleMetadata(object):
     one defined by the mapping file that maps IDs in the
     anthology XML files to the IDs in the various order files,
     the second is the same as the first but in the reverse
-    direction, and the third maps IDs in the order files
-    to tuples containing the following metadata: title,
-    authors, abstracts, and anthology URLs.
+    direction (and only created when first needed), and
+    the third maps IDs in the order files to tuples
+    containing the following metadata: title, authors,
+    abstracts, and anthology URLs.
     """
     def __init__(self, metadata_dict=None, mapping_dict=None):
         super(ScheduleMetadata, self).__init__()
         self._order_id_to_metadata_dict = metadata_dict
         self._order_id_to_anthology_id_dict = mapping_dict
-        self._anthology_id_to_order_id_dict = {v: k for k, v in mapping_dict.items()}
+        self._reverse_mapping_dict = None
+
+    @property
+    def _anthology_id_to_order_id_dict(self):
+        """
+        The reverse of the mapping dictionary, i.e., with the
+        anthology IDs as keys and the order file IDs as values.
+        It is only needed for lookups via anthology IDs and,
+        therefore, it is only created the first time it is
+        accessed and then cached.
+        """
+        if self._reverse_mapping_dict is None:
+            self._reverse_mapping_dict = {v: k for k, v in self._order_id_to_anthology_id_dict.items()}
+        return self._reverse_mapping_dict
 
     @staticmethod
     def authors_string_to_list(authorstr):
-        liststr = re.sub(r',|\band ', '|', authorstr)
-        return [author.strip() for author in liststr.split('|') if author.strip()]
+        authors = (author.strip() for author in _AUTHOR_SEPARATOR_REGEXP.split(authorstr))
+        return [author for author in authors if author]
 
     @classmethod
     def _parse_id_mapping_file(cls, mapping_file, event='main'):
@@ -91,18 +174,18 @@ class ScheduleMetadata(object):
         if not mapping_file.exists():
             raise FileNotFoundError('File {} does not exist'.format(mapping_file))
 
-        # iterate over each row of the file and populate
-        # the dictionary we want to return
+        # the mapping files are small so read the whole file
+        # at once and then iterate over each of its lines
+        # to populate the dictionary we want to return
         mapping_dict = {}
-        with open(mapping_file, 'r') as mappingfh:
-            for line in mappingfh:
-                anthology_id, order_id = line.strip().split(' ')
-                mapping_dict['{}#{}'.format(order_id, event)] = anthology_id
+        for line in mapping_file.read_text().splitlines():
+            anthology_id, order_id = line.split(None, 1)
+            mapping_dict['{}#{}'.format(order_id.rstrip(), event)] = anthology_id
 
         return mapping_dict
 
     @classmethod
-    def _parse_anthology_xml(cls, xml_file):
+    def _parse_anthology_xml(cls, xml_file, anthology_ids=None):
         """
         A private class method used to parse the
         anthology XML files containing the metadata
@@ -112,6 +195,11 @@ class ScheduleMetadata(object):
         ----------
         xml_file : str
             Path to the xml file to parse.
+        anthology_ids : set, optional
+            If specified, only the papers with these
+            anthology IDs are included in the output
+            and all other papers are skipped. Defaults
+            to `None` which means all papers are included.
 
         Returns
         -------
@@ -135,18 +223,22 @@ class ScheduleMetadata(object):
         if not xml_file.exists():
             raise FileNotFoundError('File {} does not exist'.format(xml_file))
 
-        # parse the XML file using BeautifulSoup and extract
-        # the metadata items we need for each paper; note that
-        # we do not care about which volume the paper is in
-        with open(xml_file, 'r') as xmlfh:
-            soup = BeautifulSoup(xmlfh, 'xml')
-            for paper in soup.find_all('paper'):
+        # incrementally parse the XML file and extract the
+        # metadata items we need for each paper as soon as
+        # it has been read in; note that we do not care about
+        # which volume the paper is in
+        with open(xml_file, 'rb', buffering=_READ_BUFFER_SIZE) as xmlfh:
+            for paper in _iter_xml_elements(xmlfh, 'paper'):
 
-                # get the anthology ID
-                id_ = '{}-{}'.format(xml_file.stem, paper['id'])
+                # get the anthology ID and skip the paper
+                # if it is not one of the papers we need
+                id_ = '{}-{}'.format(xml_file.stem, paper.get('id'))
+                if anthology_ids is not None and id_ not in anthology_ids:
+                    paper.clear()
+                    continue
 
                 # get the paper title
-                title = paper.title.text
+                title = _element_text(paper.find('title'))
 
                 # sometimes there are angle brackets
                 # in the title which can cause problems
@@ -154,21 +246,28 @@ class ScheduleMetadata(object):
                 if '<' in title:
                     title = html.escape(title)
 
-                # get the abstract which may not exist for all papers
-                abstract = '' if not paper.abstract else paper.abstract.text
+                # get the abstract which may not exist for all papers;
+                # note that abstracts may contain nested markup so we
+                # cannot just use `findtext()` which would ignore it
+                abstract_tag = paper.find('abstract')
+                abstract = '' if abstract_tag is None else _element_text(abstract_tag)
 
                 # get the paper's anthology URL
-                anthology_url = paper.url.text
+                anthology_url = paper.findtext('url')
 
                 # TODO: get the video URL from the anthology
                 # XML file if it has it or from somewhere else
                 video_url = ''
 
-                # get the authors which also may not exist for all papers
-                authorlist = []
-                if paper.find_all('author'):
-                    authortags = paper.find_all('author')
-                    authorlist = ['{} {}'.format(author.first.text, author.last.text) for author in authortags]
+                # get the authors which also may not exist for all
+                # papers; the author tags are only looked up once;
+                # the same authors show up on many papers so we
+                # intern the names to only keep one copy of each
+                authortags = paper.findall('author')
+                if authortags:
+                    authorlist = [sys.intern(author.findtext('first', '') + ' ' + author.findtext('last', '')) for author in authortags]
+                else:
+                    authorlist = []
 
                 # create the named tuple and save it in the dictionary
                 anthology_dict[id_] = MetadataTuple(title=title,
@@ -177,6 +276,11 @@ class ScheduleMetadata(object):
                                                     pdf_url=anthology_url,
                                                     video_url=video_url)
 
+                # we are done with this paper so free up the
+                # memory used by its contents so that the tree
+                # does not grow as we go along
+                paper.clear()
+
         # return the output dictionary
         return anthology_dict
 
@@ -221,19 +325,33 @@ class ScheduleMetadata(object):
         # to the `main` event space since this file is
         # assumed to be just necessary for the main
         # conference and no other events.
-        with open(non_anthology_tsv, 'r') as nonanthfh:
-            reader = csv.DictReader(nonanthfh,
-                                    dialect=csv.excel_tab)
+        with open(non_anthology_tsv, 'r', buffering=_READ_BUFFER_SIZE) as nonanthfh:
+            reader = csv.reader(nonanthfh, dialect=csv.excel_tab)
+
+            # use the header row to figure out which column
+            # contains which field so that we can access
+            # the fields in every other row by position
+            header = next(reader)
+            paper_id_index = header.index('paper_id')
+            title_index = header.index('title')
+            authors_index = header.index('authors')
+            abstract_index = header.index('abstract')
+
             for row in reader:
-                title = row['title'].strip()
-                authors = ScheduleMetadata.authors_string_to_list(row['authors'].strip())
-                abstract = row['abstract'].strip()
+
+                # skip any blank rows just like `csv.DictReader`
+                if not row:
+                    continue
+
+                title = row[title_index].strip()
+                authors = ScheduleMetadata.authors_string_to_list(row[authors_index].strip())
+                abstract = row[abstract_index].strip()
                 value = MetadataTuple(title=title,
                                       authors=authors,
                                       abstract=abstract,
                                       pdf_url='',
                                       video_url='')
-                key = '{}#{}'.format(row['paper_id'].strip(), event)
+                key = '{}#{}'.format(row[paper_id_index].strip(), event)
                 non_anthology_dict[key] = value
 
         # return the dictionary
@@ -243,7 +361,8 @@ class ScheduleMetadata(object):
     def fromfiles(cls,
                   xmls=[],
                   mappings={},
-                  extra_metadata_files={}):
+                  extra_metadata_files={},
+                  n_jobs=1):
         """
         Class method to create an instance of
         `ScheduleMetadata` from the set of
@@ -264,6 +383,14 @@ class ScheduleMetadata(object):
             title, authors, and abstract metdata for the
             order file IDs that are _not_ in the anthology
             XML files.
+        n_jobs : int, optional
+            The number of processes used to parse the
+            anthology XML files. By default, the files
+            are parsed one after the other in the current
+            process. If more than one process is used, the
+            calling script must guard its top-level code
+            with `if __name__ == '__main__':` since the
+            new processes may import it again.
 
         Returns
         -------
@@ -272,7 +399,6 @@ class ScheduleMetadata(object):
         """
         # initialize dictionaries we need for later
         order_id_to_anthology_id_dict = {}
-        order_id_to_metadata_dict = {}
         anthology_metadata_dict = {}
 
         # parse the ID mapping files first and update the
@@ -281,15 +407,32 @@ class ScheduleMetadata(object):
             order_id_to_anthology_id_dict.update(cls._parse_id_mapping_file(mapping, event=event))
 
         # next parse all of the anthology XML files and update
-        # the relevant dictionary with the results
-        for xml in xmls:
-            anthology_metadata_dict.update(cls._parse_anthology_xml(xml))
+        # the relevant dictionary with the results; we only need
+        # to keep the metadata for the anthology IDs that
+        # are present in the mapping files since no other
+        # papers can be looked up anyway
+        needed_anthology_ids = set(order_id_to_anthology_id_dict.values())
+        parse_xml = partial(cls._parse_anthology_xml,
+                            anthology_ids=needed_anthology_ids)
+
+        # the files are independent of each other so we can
+        # parse them in parallel using a pool of processes
+        # but only if we have been explicitly asked to
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                xml_dicts = list(executor.map(parse_xml, xmls))
+        else:
+            xml_dicts = map(parse_xml, xmls)
+        for xml_dict in xml_dicts:
+            anthology_metadata_dict.update(xml_dict)
 
         # next create the bridge between the paper ID and
-        # the anthology metadata
-        for (order_id,
-             anthology_id) in order_id_to_anthology_id_dict.items():
-            order_id_to_metadata_dict[order_id] = anthology_metadata_dict[anthology_id]
+        # the anthology metadata in a single pass over the
+        # mapping, skipping any anthology IDs that are not
+        # in any of the XML files we were given
+        order_id_to_metadata_dict = {order_id: anthology_metadata_dict[anthology_id]
+                                     for order_id, anthology_id in order_id_to_anthology_id_dict.items()
+                                     if anthology_id in anthology_metadata_dict}
 
         # next handle the non-anthology metadata TSV file
         # if one has been provided and update the
@@ -303,6 +446,112 @@ class ScheduleMetadata(object):
         return cls(metadata_dict=order_id_to_metadata_dict,
                    mapping_dict=order_id_to_anthology_id_dict)
 
+    @classmethod
+    def fromfiles_cached(cls,
+                         cache_dir,
+                         xmls=[],
+                         mappings={},
+                         extra_metadata_files={},
+                         n_jobs=1):
+        """
+        Class method to create an instance of
+        `ScheduleMetadata` from the set of relevant
+        files just like `fromfiles()` but using a
+        pickled instance saved under the given cache
+        directory, if the input files have not changed
+        since it was saved. If they have, the files are
+        parsed again and the new instance is saved to
+        the cache directory.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Path to the directory where the pickled
+            instances are saved.
+        xmls : list, optional
+            List of anthology XML files.
+        mappings : dict, optional
+            Dictionary of event names as keys
+            and paths to ID mapping (`id_map.txt`) files
+            as values.
+        extra_metadata_files : dict, optional
+            Dictionary of event names as keys and
+            paths to non-anthology metadata files
+            as values.
+        n_jobs : int, optional
+            The number of processes used to parse the
+            anthology XML files, if they need to be parsed.
+            See `fromfiles()` for details.
+
+        Returns
+        -------
+        schedule_metadata : ScheduleMetadata
+            A populated instance of `ScheduleMetadata`.
+        """
+        # compute a key that identifies the given input files;
+        # it takes into account the event names, the paths,
+        # as well as the modification times and sizes of the
+        # files so that any changes to them invalidate the cache;
+        # it also includes the cache format version so that any
+        # changes to the parsing code invalidate the cache too
+        signature = (_CACHE_FORMAT_VERSION,
+                     [_file_signature(xml) for xml in xmls],
+                     sorted((event, _file_signature(mapping))
+                            for event, mapping in mappings.items()),
+                     sorted((event, _file_signature(extra_metadata_file))
+                            for event, extra_metadata_file in extra_metadata_files.items()))
+        key = hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+        # if we have already pickled an instance for these
+        # files, then simply load it and return it; if the
+        # pickle cannot be loaded for any reason (e.g., it is
+        # truncated or it was saved when this module was
+        # imported under a different name), we treat it as
+        # if it did not exist
+        cache_dir = Path(cache_dir)
+        cache_file = cache_dir / '{}.pkl'.format(key)
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'rb') as cachefh:
+                    return pickle.load(cachefh)
+            except Exception:
+                pass
+
+        # otherwise, parse the files and save the
+        # new instance to the cache directory; we write
+        # it to a temporary file first and then move it
+        # into place so that an interrupted write never
+        # leaves behind a partial file under the final name;
+        # the temporary file is only readable by its owner so
+        # we give it the usual permissions for new files first
+        schedule_metadata = cls.fromfiles(xmls=xmls,
+                                          mappings=mappings,
+                                          extra_metadata_files=extra_metadata_files,
+                                          n_jobs=n_jobs)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=str(cache_dir),
+                                suffix='.tmp',
+                                delete=False) as cachefh:
+            try:
+                pickle.dump(schedule_metadata, cachefh)
+            except BaseException:
+                cachefh.close()
+                os.remove(cachefh.name)
+                raise
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(cachefh.name, 0o666 & ~umask)
+        os.replace(cachefh.name, str(cache_file))
+
+        # remove any instances pickled for older versions
+        # of the input files since they can never be used
+        # again and would otherwise pile up over time
+        for old_cache_file in cache_dir.glob('*.pkl'):
+            if old_cache_file != cache_file:
+                old_cache_file.unlink()
+
+        return schedule_metadata
+
     def lookup(self, id_, event='main'):
         """
         Look up metadata for an order file ID from a particular event
@@ -338,7 +587,7 @@ class ScheduleMetadata(object):
             If no metadata could be found for the given
             ID.
         """
-        if id_[0] in ['N', 'W', 'S']:
+        if id_.startswith(_ANTHOLOGY_ID_PREFIXES):
             order_id = self._anthology_id_to_order_id_dict[id_]
         else:
             order_id = '{}#{}'.format(id_, event)
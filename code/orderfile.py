@@ -7,11 +7,21 @@ Date: May, 2019
 """
 
 import re
+import sys
 
 from datetime import datetime
+from functools import lru_cache
 from itertools import count
 
-_METADATA_REGEXP = re.compile(r'%([^\s]+)\s+([^%]+)')
+# the types of sessions that are never part of a session
+# group even if they show up while a group is active
+_NON_GROUPING_SESSION_TYPES = frozenset(['plenary', 'break'])
+
+# the title-cased item types used when printing items
+# so that we do not need to title-case them every time
+_ITEM_TYPE_TITLES = {'paper': 'Paper',
+                     'poster': 'Poster',
+                     'tutorial': 'Tutorial'}
 
 
 def parse_order_file_metadata(metadata_string):
@@ -41,8 +51,29 @@ def parse_order_file_metadata(metadata_string):
         A dictionary containing the metadata keys
         and values.
     """
-    metadata_string = metadata_string.strip()
-    return dict(_METADATA_REGEXP.findall(metadata_string))
+    # the metadata string is just a sequence of "%key value"
+    # fields so we can simply split it on "%" and then split
+    # each field into the key and the value; anything before
+    # the first "%" and any keys without values are ignored
+    metadata_dict = {}
+    for field in metadata_string.split('%')[1:]:
+        key_and_value = field.split(None, 1)
+        if len(key_and_value) == 2:
+            key, value = key_and_value
+            metadata_dict[key] = value.rstrip()
+
+    return metadata_dict
+
+
+@lru_cache(maxsize=32)
+def _parse_day_string(day_string):
+    """
+    Parse a day string such as "Monday, June 2, 2019"
+    into a `datetime` object. Since `strptime()` is slow
+    and there are only a handful of distinct days in any
+    conference, the results are cached.
+    """
+    return datetime.strptime(day_string, '%A, %B %d, %Y')
 
 
 class Agenda(object):
@@ -71,7 +102,10 @@ class Agenda(object):
         group (if it's a parallel track) or the currently
         active day, if it's a plenary session. This method
         updates the objects passed in via reference directly
-        and does not return anything.
+        and does not return anything. The actual work is done
+        by the `_save_*()` methods, which `fromfile()` calls
+        directly for the transitions that only need some of
+        the states to be saved.
 
         Parameters
         ----------
@@ -110,6 +144,21 @@ class Agenda(object):
          current_session,
          current_item) = current_tuple
 
+        self._save_item(current_item, current_session)
+        if save_session:
+            self._save_session(current_session, current_session_group, current_day)
+        if save_group:
+            self._save_session_group(current_session_group, current_day)
+        if save_day:
+            self._save_day(current_day)
+
+    def _save_item(self, current_item, current_session):
+        """
+        Save the currently active `Item` object, if any,
+        to the currently active `Session` object, if any.
+        This is the only state that needs to be saved
+        when we encounter a new item or a poster topic.
+        """
         # if there is an active item ...
         if current_item:
 
@@ -125,13 +174,20 @@ class Agenda(object):
             if current_session:
                 current_session.add(current_item)
 
+    def _save_session(self, current_session, current_session_group, current_day):
+        """
+        Save the currently active `Session` object, if any,
+        to either the currently active `SessionGroup` object
+        (if it's a parallel track) or the currently active
+        `Day` object.
+        """
         # if there is an active session ....
-        if save_session and current_session:
+        if current_session:
 
             # add it to the active session group
             # if any (unless it's a plenary/break session);
             if (current_session_group and
-                    current_session.type not in ['plenary', 'break']):
+                    current_session.type not in _NON_GROUPING_SESSION_TYPES):
                     current_session_group.add(current_session)
 
             # otherwise add it to the active day
@@ -141,21 +197,26 @@ class Agenda(object):
             # also reset the poster number counter
             self._poster_number_counter = count(1)
 
-        # save the currently active session group, if
-        # any, to the active day
-        if save_group and current_session_group:
+    def _save_session_group(self, current_session_group, current_day):
+        """
+        Save the currently active `SessionGroup` object,
+        if any, to the currently active `Day` object.
+        """
+        if current_session_group:
 
             current_day.add(current_session_group)
 
             # also reset the poster number counter
             self._poster_number_counter = count(1)
 
-        # save the active day to the agenda
-        if save_day:
-            self.days.append(current_day)
+    def _save_day(self, current_day):
+        """
+        Save the currently active `Day` object to the agenda.
+        """
+        self.days.append(current_day)
 
-            # also reset the poster number counter
-            self._poster_number_counter = count(1)
+        # also reset the poster number counter
+        self._poster_number_counter = count(1)
 
     def fromfile(self, filepath):
         """
@@ -178,15 +239,25 @@ class Agenda(object):
         current_item = None
         self.days = []
 
-        # iterate over each line in the order file
-        with open(filepath, 'r') as orderfh:
-            for line in orderfh:
+        # bind the item matching method to a local name since
+        # it is looked up for most of the lines in the file
+        match_item = Item._regexp.fullmatch
+
+        # read in the whole order file at once since it is
+        # small and then iterate over each line in it
+        with open(filepath, 'r', encoding='utf-8') as orderfh:
+            for line in orderfh.read().splitlines():
                 line = line.strip()
                 if not line:
                     continue
 
+                # the type of each line is indicated by its
+                # first two characters so we only look at them
+                # once instead of checking each possible prefix
+                marker = line[:2]
+
                 # if we encounter a new day ..
-                if line.startswith('* '):
+                if marker == '* ':
 
                     # update the various pending states
                     if current_day:
@@ -206,13 +277,13 @@ class Agenda(object):
                     current_day = Day.fromstring(line)
 
                 # if we encounter a new plenary session ...
-                elif line.startswith('! '):
+                elif marker == '! ':
 
                     # update the various pending states
-                    self.save_states((current_day,
-                                      current_session_group,
-                                      current_session,
-                                      current_item), save_day=False)
+                    # except for the day
+                    self._save_item(current_item, current_session)
+                    self._save_session(current_session, current_session_group, current_day)
+                    self._save_session_group(current_session_group, current_day)
 
                     # make it so that there is no group active anymore
                     # since session groups cannot span plenary sessions
@@ -223,13 +294,12 @@ class Agenda(object):
                     current_session = Session.fromstring(line)
 
                 # if we encounter a new session group ...
-                elif line.startswith('+ '):
+                elif marker == '+ ':
 
-                    # update the states
-                    self.save_states((current_day,
-                                      current_session_group,
-                                      current_session,
-                                      current_item), save_day=False)
+                    # update the states except for the day
+                    self._save_item(current_item, current_session)
+                    self._save_session(current_session, current_session_group, current_day)
+                    self._save_session_group(current_session_group, current_day)
 
                     # there is no longer an active session
                     # or an active item
@@ -241,17 +311,13 @@ class Agenda(object):
 
                 # if we encounter a new paper/poster/tutorial/best-paper
                 # session ...
-                elif line.startswith('= '):
+                elif marker == '= ':
 
                     # update states but do not yet save
                     # the currently active session group
                     # since we may still be in it
-                    self.save_states((current_day,
-                                      current_session_group,
-                                      current_session,
-                                      current_item),
-                                     save_day=False,
-                                     save_group=False)
+                    self._save_item(current_item, current_session)
+                    self._save_session(current_session, current_session_group, current_day)
 
                     # nullify any previously active item
                     current_item = None
@@ -260,29 +326,31 @@ class Agenda(object):
                     current_session = Session.fromstring(line)
 
                 # if we encounter a poster group topic ...
-                elif line.startswith('@'):
+                elif marker[0] == '@':
 
                     # update the states for pending items
                     # but do not yet save the day, the session
                     # group or the session since we are still
                     # in them
-                    self.save_states((current_day,
-                                      current_session_group,
-                                      current_session,
-                                      current_item),
-                                     save_day=False,
-                                     save_group=False,
-                                     save_session=False)
+                    self._save_item(current_item, current_session)
 
                     # save the topic to greedily attach to
                     # the next poster we see, which should
                     # be the next line
-                    current_poster_topic = line.lstrip('@ ').rstrip().replace('\&', '&')
+                    current_poster_topic = line[1:].strip().replace('\\&', '&')
                     current_item = None
 
                 # if we encounter a presentation item
-                # (poster/paper/tutorial) ...
-                elif Item._regexp.match(line):
+                # (poster/paper/tutorial) which always starts
+                # with a number ...
+                elif marker[0].isdigit():
+
+                    # match the item regular expression only
+                    # once and reuse the match object below;
+                    # lines that do not match are ignored
+                    matchobj = match_item(line)
+                    if not matchobj:
+                        continue
 
                     # if we have encountered a poster and
                     # we have an active poster topic, attach
@@ -300,16 +368,9 @@ class Agenda(object):
                     # but do not yet save the day, the session
                     # group or the session since we may still
                     # be in them
-                    self.save_states((current_day,
-                                      current_session_group,
-                                      current_session,
-                                      current_item),
-                                     save_session=False,
-                                     save_day=False,
-                                     save_group=False)
+                    self._save_item(current_item, current_session)
 
                     # make this new item the currently active one
-                    matchobj = Item._regexp.match(line)
                     current_item = Item.fromstring(matchobj, current_session.type)
 
             # after we are done iterating through the
@@ -331,7 +392,7 @@ class Agenda(object):
 
     def __repr__(self):
         # initialize the output variable
-        out = ['Agenda for event "{}":'.format(self.event)]
+        out = [f'Agenda for event "{self.event}":']
 
         # iterate over each day ...
         for day in self.days:
@@ -377,7 +438,7 @@ class Day(object):
         return self.datetime.strftime('%A, %B %d, %Y')
 
     def __repr__(self):
-        return 'Day <{}>'.format(str(self))
+        return f'Day <{self}>'
 
     @classmethod
     def fromstring(cls, day_string):
@@ -389,7 +450,8 @@ class Day(object):
         ----------
         day_string : str
             A string indicating the day in the order
-            file. An example string looks like this:
+            file, with or without the leading "* ". An
+            example string looks like this:
             "Monday, June 2, 2019".
 
         Returns
@@ -397,8 +459,13 @@ class Day(object):
         day : Day
             An instance of `Day`.
         """
-        real_day_string = day_string.lstrip('* ').rstrip()
-        return cls(datetime.strptime(real_day_string, '%A, %B %d, %Y'))
+        # only remove the leading marker if it is actually
+        # there rather than stripping all leading "*"s and
+        # spaces which would also eat into the day itself
+        if day_string.startswith('* '):
+            day_string = day_string[2:]
+        real_day_string = day_string.strip()
+        return cls(_parse_day_string(real_day_string))
 
     def add(self, session_or_session_group):
         """
@@ -421,7 +488,7 @@ class SessionGroup(object):
     contains (represented as `Session` objects), a start
     time, and an end time.
     """
-    _regexp = re.compile(r'([0-9]{1,2}:[0-9]{2})--([0-9]{1,2}:[0-9]{2})\s+(.*)')
+    _regexp = re.compile(r'([0-9]{1,2}:[0-9]{2})--([0-9]{1,2}:[0-9]{2})\s+(.*?)\s*')
 
     def __init__(self, title='', start_time='', end_time=''):
         super(SessionGroup, self).__init__()
@@ -442,22 +509,25 @@ class SessionGroup(object):
         ----------
         session_group_string : str
             The string indicating a session group in
-            the order file.
+            the order file, with or without the leading "+ ".
 
         Returns
         -------
         session_group : SessionGroup
             An instance of `SessionGroup`.
         """
-        real_session_group_string = session_group_string.lstrip('+ ')
+        # only remove the leading marker if it is actually there
+        if session_group_string.startswith('+ '):
+            session_group_string = session_group_string[2:]
+        real_session_group_string = session_group_string.strip()
         (session_group_start,
          session_group_end,
-         session_group_title) = cls._regexp.match(real_session_group_string).groups()
+         session_group_title) = cls._regexp.fullmatch(real_session_group_string).groups()
 
         # replace any "\&"s with "&"s
-        return cls(title=session_group_title.strip().replace('\\&', '&'),
-                   start_time=session_group_start.strip(),
-                   end_time=session_group_end.strip())
+        return cls(title=session_group_title.replace('\\&', '&'),
+                   start_time=session_group_start,
+                   end_time=session_group_end)
 
     def add(self, session):
         """
@@ -471,9 +541,7 @@ class SessionGroup(object):
         self.sessions.append(session)
 
     def __repr__(self):
-        return 'SessionGroup {}--{} <{}>'.format(self.start,
-                                                 self.end,
-                                                 self.title)
+        return f'SessionGroup {self.start}--{self.end} <{self.title}>'
 
 
 class Session(object):
@@ -487,8 +555,14 @@ class Session(object):
     """
 
     # define regular expressions to parse the session strings
-    _any_session_regexp = re.compile(r'^([!=])\s*(([0-9]{1,2}:[0-9]{2})--([0-9]{1,2}:[0-9]{2}))?\s*([^#]+)?#?([^#]+)?$')
-    _session_id_regexp = re.compile('Session ([0-9A-Za-z]+)\s*:')
+    _any_session_regexp = re.compile(r'([!=])\s*(?:([0-9]{1,2}:[0-9]{2})--([0-9]{1,2}:[0-9]{2}))?\s*([^#]*?)\s*(?:#([^#]*))?')
+    _session_id_regexp = re.compile(r'Session ([0-9A-Za-z]+)\s*:\s*')
+
+    # define regular expressions to infer the session type from the title
+    _break_regexp = re.compile(r'break|lunch|coffee', re.I)
+    _poster_regexp = re.compile(r'poster', re.I)
+    _tutorial_regexp = re.compile(r'tutorial', re.I)
+    _best_paper_regexp = re.compile(r'best paper', re.I)
 
     def __init__(self,
                  session_id='',
@@ -502,7 +576,9 @@ class Session(object):
         super(Session, self).__init__()
         self.id_ = session_id
         self.title = title
-        self.type = type
+        # the session type is compared against for every item
+        # so we intern it to make these comparisons cheap
+        self.type = sys.intern(type)
         self.location = location
         self.chair = chair
         self.start = start_time
@@ -511,23 +587,20 @@ class Session(object):
         self.extended_metadata = {} if not extended_metadata else extended_metadata
 
     def __repr__(self):
-        out = 'Session '
-        if self.start:
-            out += '{}--{} '.format(self.start, self.end)
-        attrs = ['type={}'.format(self.type)]
+        times = f'{self.start}--{self.end} ' if self.start else ''
+        attrs = [f'type={self.type}']
         if self.id_:
-            attrs.append('id={}'.format(self.id_))
+            attrs.append(f'id={self.id_}')
         if self.title:
-            attrs.append('title={}'.format(self.title))
+            attrs.append(f'title={self.title}')
         if self.location:
-            attrs.append('room={}'.format(self.location))
+            attrs.append(f'room={self.location}')
         if self.chair:
-            attrs.append('chair={}'.format(self.chair))
-        for key, value in self.extended_metadata.items():
-            attrs.append('{}={}'.format(key, value))
-        out += '<' + ', '.join(attrs) + '>'
+            attrs.append(f'chair={self.chair}')
+        attrs.extend(f'{key}={value}' for key, value
+                     in self.extended_metadata.items())
 
-        return out
+        return f'Session {times}<{", ".join(attrs)}>'
 
     def add(self, item):
         self.items.append(item)
@@ -545,7 +618,7 @@ class Session(object):
         Break : "! 12:30--14:00 Lunch Break"
         Non-break Plenary : "! 9:30--10:30 Keynote 1: Arvind Narayanan "Data as a Mirror of Society: Lessons from the Emerging Science of Fairness in Machine Learning" # %room Nicollet Grand Ballroom"
         Paper : "= Session 1B: Speech # %room Nicollet A %chair1 Yang Liu"
-        Poster : "= Session 1F: Question Answering, Sentiment, Machine Translation, Resources \& Evaluation (Posters) # %room Hyatt Exhibit Hall"
+        Poster : "= Session 1F: Question Answering, Sentiment, Machine Translation, Resources \\& Evaluation (Posters) # %room Hyatt Exhibit Hall"
 
         Break and non-break plenary sessions are distinguished
         by the presence of the words "break/coffee/lunch". Paper
@@ -567,11 +640,10 @@ class Session(object):
 
         # use the generic session regular expression; it must match
         # or else there is a problem
-        m = cls._any_session_regexp.match(session_string)
+        m = cls._any_session_regexp.fullmatch(session_string)
         assert m is not None
 
         (starting_char,
-         _,
          start_time,
          end_time,
          title,
@@ -583,25 +655,28 @@ class Session(object):
         # if the string starts with '!', it's either a plenary session
         # or a break session
         if starting_char == '!':
-            session_type = 'break' if re.search(r'break|lunch|coffee', title.lower()) else 'plenary'
+            session_type = 'break' if cls._break_regexp.search(title) else 'plenary'
             id_ = ''
         # if the starting character is '=', it's a presentation
         # session with actual presentation items (paper/poster/tutorial)
         elif starting_char == '=':
             # we assume a paper session by default
-            # and override based on the title
-            if re.search('poster', title, re.I):
+            # and override based on the title; for paper
+            # and poster sessions, we also remove the session
+            # ID from the title using the position where it
+            # was found rather than searching for it again
+            if cls._poster_regexp.search(title):
                 session_type = 'poster'
                 m = cls._session_id_regexp.search(title)
                 if m:
                     id_ = m.group(1)
-                    title = re.sub(cls._session_id_regexp, '', title)
+                    title = title[:m.start()] + title[m.end():]
                 else:
                     id_ = ''
-            elif re.search('tutorial', title, re.I):
+            elif cls._tutorial_regexp.search(title):
                 session_type = 'tutorial'
                 id_ = ''
-            elif re.search('best paper', title, re.I):
+            elif cls._best_paper_regexp.search(title):
                 session_type = 'best_paper'
                 id_ = ''
             else:
@@ -609,7 +684,7 @@ class Session(object):
                 m = cls._session_id_regexp.search(title)
                 if m:
                     id_ = m.group(1)
-                    title = re.sub(cls._session_id_regexp, '', title)
+                    title = title[:m.start()] + title[m.end():]
                 else:
                     id_ = ''
 
@@ -619,17 +694,17 @@ class Session(object):
         # if there are metdata attributes other than 'room'
         # and 'chair' in the metadata dictionary, save those
         # as extended metadata
-        extra_metadata_dict = {k: v.strip() for k, v in metadata_dict.items()
+        extra_metadata_dict = {k: v for k, v in metadata_dict.items()
                                if k not in ['room', 'chair']}
 
         # replace any "\&"s with "&"s in the title
         return cls(session_id=id_,
-                   title=title.strip().replace('\&', '&'),
+                   title=title.replace('\\&', '&'),
                    type=session_type,
-                   location=metadata_dict.get('room', '').strip(),
-                   chair=metadata_dict.get('chair1', '').strip(),
-                   start_time=start_time.strip() if start_time else '',
-                   end_time=end_time.strip() if end_time else '',
+                   location=metadata_dict.get('room', ''),
+                   chair=metadata_dict.get('chair1', ''),
+                   start_time=start_time or '',
+                   end_time=end_time or '',
                    extended_metadata=extra_metadata_dict)
 
 
@@ -642,30 +717,51 @@ class Item(object):
     Industry items are all considered papers.
     An Item is defined by an ID, the `type` attribute
     ("paper", "poster", or "tutorial"), a title, authors,
-    a track ("demos", "srw", or "industry"), a location
-    (if any), a start time (if any), and an end time
-    (if any).
+    a topic (only for posters), a location (if any),
+    paper and video URLs (if any), a start time (if any),
+    and an end time (if any). Attributes that do not apply
+    to a given item are left empty.
     """
 
-    _regexp = re.compile(r'^([0-9]+(-[a-z]+)?)(\s*([0-9]{1,2}:[0-9]{2})--([0-9]{1,2}:[0-9]{2}))?\s+#([^#]*)$')
+    _regexp = re.compile(r'(?P<id>[0-9]+(?:-(?P<suffix>[a-z]+))?)(?:\s*(?P<start>[0-9]{1,2}:[0-9]{2})--(?P<end>[0-9]{1,2}:[0-9]{2}))?\s+#(?P<metadata>[^#]*)')
 
-    def __init__(self, id_, type, **kwargs):
+    def __init__(self,
+                 id_,
+                 type,
+                 title='',
+                 authors='',
+                 topic='',
+                 location='',
+                 paper_url='',
+                 video_url='',
+                 start='',
+                 end='',
+                 extended_metadata=None):
         super(Item, self).__init__()
         self.id_ = id_
-        self.type = type
-        for key, value in kwargs.items():
-            self.__setattr__(key, value)
+        # the item type is compared against whenever the item
+        # is saved so we intern it, just like the session type
+        self.type = sys.intern(type)
+        self.title = title
+        self.authors = authors
+        self.topic = topic
+        self.location = location
+        self.paper_url = paper_url
+        self.video_url = video_url
+        self.start = start
+        self.end = end
+        self.extended_metadata = {} if not extended_metadata else extended_metadata
 
     def __repr__(self):
-        out = '{} '.format(self.type.title())
-        attrs = ['id={}'.format(self.id_)]
-        for key, value in self.extended_metadata.items():
-            attrs.append('{}={}'.format(key, value))
+        # use the pre-computed title for the known item types
+        type_title = _ITEM_TYPE_TITLES.get(self.type) or self.type.title()
+        attrs = [f'id={self.id_}']
+        attrs.extend(f'{key}={value}' for key, value
+                     in self.extended_metadata.items())
         if self.type == 'poster' and self.topic:
-            attrs.append('topic={}'.format(self.topic))
-        out += '<' + ', '.join(attrs) + '>'
+            attrs.append(f'topic={self.topic}')
 
-        return out
+        return f'{type_title} <{", ".join(attrs)}>'
 
     @classmethod
     def fromstring(cls,
@@ -699,19 +795,26 @@ class Item(object):
         item : Item
             An instance of `Item`.
         """
+        # get the various parts of the item string
+        # from the named groups in the match object
         (item_id,
-         _,
-         _,
+         item_suffix,
          start_time,
          end_time,
-         metadata_string) = item_regex_match_object.groups()
+         metadata_string) = item_regex_match_object.group('id',
+                                                          'suffix',
+                                                          'start',
+                                                          'end',
+                                                          'metadata')
 
-        # parse the metadata string for the item, if any
-        metadata_dict = parse_order_file_metadata(metadata_string)
+        # parse the metadata string for the item, if any; most
+        # items do not have any metadata so we skip the parsing
+        # entirely unless there is at least one "%" in it
+        metadata_dict = parse_order_file_metadata(metadata_string) if '%' in metadata_string else {}
 
         # if there are metdata attributes other than 'room'
         # in the metadata dictionary, save those as extended metadata
-        extra_metadata_dict = {k: v.strip() for k, v in metadata_dict.items()
+        extra_metadata_dict = {k: v for k, v in metadata_dict.items()
                                if k != 'room'}
 
         if containing_session_type == 'poster':
@@ -722,8 +825,7 @@ class Item(object):
                        authors='',
                        paper_url='',
                        extended_metadata=extra_metadata_dict)
-        elif (containing_session_type == 'paper' or
-                containing_session_type == 'best_paper'):
+        elif containing_session_type in ('paper', 'best_paper'):
             return cls(item_id,
                        'paper',
                        title='',
@@ -734,12 +836,12 @@ class Item(object):
                        end=end_time,
                        extended_metadata=extra_metadata_dict)
         elif containing_session_type == 'tutorial':
-            assert item_id.endswith('-tutorial')
+            assert item_suffix == 'tutorial'
             return cls(item_id,
                        'tutorial',
                        title='',
                        authors='',
-                       location=metadata_dict.get('room', '').strip(),
+                       location=metadata_dict.get('room', ''),
                        start=start_time,
                        end=end_time,
                        extended_metadata=extra_metadata_dict)